@@ -51,6 +51,8 @@ import requests
 import streamlit as st
 import streamlit.components.v1 as _stc
 
+from excel_indexer import trigram_matches
+
 # ── Konstanta ────────────────────────────────────────────────────────────────
 STORAGE_BUCKET   = "part-photos"
 METADATA_TABLE   = "part_photos"
@@ -314,25 +316,45 @@ def invalidate_photo_cache(pn: str):
 #  HELPER — Search Excel Files (dipakai di tab admin)
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def _search_excel_by_pn(query: str, excel_files: list) -> list[dict]:
-    """Cari di excel_files berdasarkan Part Number."""
+def _search_excel_by_pn(query: str, excel_files: list,
+                        search_index: dict | None = None) -> list[dict]:
+    """
+    Cari di excel_files berdasarkan Part Number.
+    `search_index` (opsional, dari `build_search_index`): PN kandidat diambil
+    lewat index trigram global — tidak perlu scan semua key di semua file.
+    """
     results = []
     q = query.strip().upper()
     if not q:
         return results
     seen = set()
+
+    def _add(fi, i):
+        pn = str(fi["part_number_arr"][i]).strip()
+        if pn and pn.upper() not in seen:
+            seen.add(pn.upper())
+            results.append({
+                "part_number": pn,
+                "part_name":   str(fi["part_name_arr"][i]).strip(),
+                "file":        fi.get("simple_name", ""),
+            })
+
+    matches = trigram_matches(q, search_index["pn"]) if search_index else None
+    if matches is not None:
+        # Vocab index urut kemunculan pertama per (file, PN) — hasil sama
+        # persis dengan loop scan di bawah.
+        postings = search_index["pn"]["postings"]
+        for pn_key in matches:
+            fi = excel_files[int(postings[pn_key][0])]
+            _add(fi, fi["part_number_index"][pn_key][0])
+            if len(results) >= 20:
+                break
+        return results
+
     for fi in excel_files:
         for pn_key, indices in fi.get("part_number_index", {}).items():
             if q in pn_key:
-                row = fi["dataframe"].iloc[indices[0]]
-                pn  = str(row.get("part_number", "")).strip()
-                if pn and pn.upper() not in seen:
-                    seen.add(pn.upper())
-                    results.append({
-                        "part_number": pn,
-                        "part_name":   str(row.get("part_name", "")).strip(),
-                        "file":        fi.get("simple_name", ""),
-                    })
+                _add(fi, indices[0])
                 if len(results) >= 20:
                     return results
     return results
@@ -354,9 +376,8 @@ def _search_excel_by_name(query: str, excel_files: list) -> list[dict]:
                     matching.update(pni[word])
         for idx in matching:
             try:
-                row  = fi["dataframe"].iloc[idx]
-                pn   = str(row.get("part_number", "")).strip()
-                name = str(row.get("part_name",   "")).strip()
+                pn   = str(fi["part_number_arr"][idx]).strip()
+                name = str(fi["part_name_arr"][idx]).strip()
                 if pn and pn.upper() not in seen:
                     if any(qw in name.upper() for qw in q_words):
                         seen.add(pn.upper())
@@ -494,7 +515,8 @@ def render_foto_part_tab():
             if do_search and search_q.strip():
                 with st.spinner("Mencari..."):
                     if search_mode == "Part Number":
-                        found = _search_excel_by_pn(search_q, excel_files)
+                        found = _search_excel_by_pn(
+                            search_q, excel_files, st.session_state.get("search_index"))
                     else:
                         found = _search_excel_by_name(search_q, excel_files)
     
@@ -6,6 +6,7 @@ EXCEL PART SEARCH WEB APP dengan AUTO-LOADING + LOGIN SYSTEM + THRESHOLD + BATCH
 import streamlit as st
 import streamlit.components.v1 as _stc
 import pandas as pd
+import numpy as np
 import os
 from pathlib import Path
 from datetime import datetime
@@ -19,6 +20,12 @@ import io
 import json
 import requests
 
+from excel_indexer import (
+    EXCEL_READ_ENGINE, build_search_index, index_excel_file, trigram_matches,
+    pack_for_cache, unpack_from_cache, intern_strings,
+    pack_search_index, unpack_search_index,
+)
+
 
 # ── Supabase (Auth + Permissions) ───────────────────────────────────
 try:
@@ -978,7 +985,17 @@ TAB_PERSIST_JS = """
 </script>
 """
 
-st.markdown("""
+def _minify_style_html(html: str) -> str:
+    """Buang komentar CSS + whitespace berlebih. Dijalankan sekali saat import."""
+    html = re.sub(r"/\*.*?\*/", "", html, flags=re.S)
+    html = re.sub(r"\s+", " ", html)
+    return re.sub(r"\s*([{};])\s*", r"\1", html).strip()
+
+
+# CSS global di-minify sekali di level modul — st.markdown di bawah tetap
+# harus jalan tiap rerun (elemen yang tidak di-emit ulang hilang dari
+# halaman), tapi payload yang dikirim ke browser jauh lebih kecil.
+_GLOBAL_STYLE_HTML = _minify_style_html("""
 <link rel="preconnect" href="https://fonts.googleapis.com">
 <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
 <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&family=JetBrains+Mono:wght@400;500;600;700&display=swap" rel="stylesheet">
@@ -1420,7 +1437,9 @@ st.markdown("""
     .mp-sb-stat b { color: var(--mp-ink); font-weight: 600; }
     .mp-sb-stat b.green { color: var(--mp-green); }
 </style>
-""", unsafe_allow_html=True)
+""")
+
+st.markdown(_GLOBAL_STYLE_HTML, unsafe_allow_html=True)
 
 SESSION_TIMEOUT_MINUTES = 720  # 12 jam
 LOGIN_FOLDER    = Path("login")
@@ -1429,6 +1448,29 @@ CACHE_FOLDER    = Path(".cache")
 IMAGES_FOLDER   = Path("images")
 
 
+def _login_folder_watermark() -> tuple:
+    """(nama, size, mtime_ns) file Excel di /login — berubah kalau ada edit."""
+    try:
+        return tuple(sorted(
+            (p.name, st_.st_size, st_.st_mtime_ns)
+            for p in LOGIN_FOLDER.iterdir()
+            if p.suffix.lower() in (".xlsx", ".xls", ".xlsm")
+            for st_ in (p.stat(),)
+        ))
+    except OSError:
+        return ()
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_login_excel_shared(watermark: tuple) -> pd.DataFrame:
+    """
+    `_load_users_from_excel` yang di-share antar session, key = watermark
+    folder /login. Session baru / Reload Users tanpa perubahan file tidak
+    parse ulang Excel; file diedit → mtime beda → load ulang. Read-only.
+    """
+    return LoginManager._load_users_from_excel()
+
+
 # ── Login Manager ───────────────────────────────────────────────────
 class LoginManager:
     def __init__(self):
@@ -1449,7 +1491,7 @@ class LoginManager:
             if not df.empty:
                 return df
             # Jika Supabase kosong, tetap coba Excel sebagai fallback
-        return LoginManager._load_users_from_excel()
+        return _load_login_excel_shared(_login_folder_watermark())
 
     @staticmethod
     def _load_users_from_excel() -> pd.DataFrame:
@@ -1460,9 +1502,13 @@ class LoginManager:
             if fpath.suffix.lower() not in excel_ext:
                 continue
             try:
-                xls = pd.ExcelFile(fpath, engine="openpyxl")
-                for sheet in xls.sheet_names:
-                    df = pd.read_excel(xls, sheet_name=sheet, dtype=str, header=None)
+                try:
+                    sheets = pd.read_excel(fpath, sheet_name=None, dtype=str, header=None,
+                                           engine=EXCEL_READ_ENGINE)
+                except Exception:
+                    sheets = pd.read_excel(fpath, sheet_name=None, dtype=str, header=None,
+                                           engine="openpyxl")
+                for df in sheets.values():
                     if len(df) == 0:
                         continue
                     first = df.iloc[0].astype(str).str.strip().str.lower().tolist()
@@ -1560,11 +1606,11 @@ class LoginManager:
         # cache (excel_files) putus → data shared TETAP hidup di
         # _load_excel_index_shared untuk user lain.
         STATIC_KEYS = (
-            "excel_files", "index_data", "search_results",
+            "excel_files", "search_index", "index_data", "search_results",
             "harga_data", "harga_lookup", "stok_data",
             "stok_gudang_data", "stok_gudang_names",
             "last_index_time", "loaded_files_count", "last_file_count",
-            "file_hashes", "search_type", "search_term",
+            "file_hashes", "search_type", "search_term", "search_limit",
             "_pn_scroll_to_image", "_img_idx_results_ts",
         )
         for k in STATIC_KEYS:
@@ -1705,12 +1751,14 @@ def render_login_page(login_mgr: LoginManager):
     # ── Left: brand + tagline + stats ─────────────────────────────────
     with col_brand:
         # Hitung file Excel langsung dari filesystem supaya angka valid
-        # sejak login page (file belum di-index sebelum login).
+        # sejak login page (file belum di-index sebelum login). Pakai walk
+        # scandir yang sama dengan loader index (di-cache 30 detik), jadi
+        # tidak ada rglob per render dan load index setelah login tinggal
+        # pakai hasil walk ini.
         n_files = st.session_state.get("loaded_files_count", 0)
         if not n_files:
             try:
-                n_files = sum(1 for _ in DATA_FOLDER.rglob("*.xlsx")
-                              if not _.name.startswith("~$"))
+                n_files = _data_folder_watermark(str(DATA_FOLDER))[0]
             except Exception:
                 n_files = 0
         n_files_str = f"{n_files:,}" if n_files else "—"
@@ -1819,6 +1867,29 @@ def _stok_to_int(v):
         return 0
 
 
+def _stok_column_to_int(col):
+    """
+    Versi kolom `_stok_to_int`: Series → int64 ndarray. Parse numerik
+    vectorized (to_numeric); sel yang gagal di-parse tapi tidak kosong
+    (jarang, mis. "1_000") jatuh ke `_stok_to_int` supaya hasil identik.
+    """
+    s   = col.fillna("").astype(str).str.strip()
+    bad = (s == "") | s.str.lower().isin(("nan", "none", "—", "-"))
+    s   = s.str.replace(",", "", regex=False).str.replace(".", "", regex=False)
+    num = pd.to_numeric(s.where(~bad), errors="coerce").to_numpy(dtype=np.float64)
+    out = np.zeros(len(s), dtype=np.int64)
+    # |nilai| ≥ 2**63 tidak muat int64 — ikut jalur `_stok_to_int` (int
+    # Python), array-nya dinaikkan ke object kalau memang ada.
+    ok  = np.isfinite(num) & (np.abs(num) < 2.0 ** 63)
+    out[ok] = np.trunc(num[ok]).astype(np.int64)
+    for i in np.flatnonzero(~ok & ~bad.to_numpy()):
+        v = _stok_to_int(s.iat[i])
+        if out.dtype != object and not -2 ** 63 <= v < 2 ** 63:
+            out = out.astype(object)
+        out[i] = v
+    return out
+
+
 def parse_stok_file(file_bytes):
     """
     Parse file stok. Mendukung 2 format:
@@ -1835,9 +1906,14 @@ def parse_stok_file(file_bytes):
       gudang_names : [nama_gudang, …]             — urutan kolom gudang
     """
     try:
-        raw = pd.read_excel(io.BytesIO(file_bytes), header=None, dtype=str)
-    except Exception as e:
-        raise RuntimeError(f"Gagal baca Excel stok: {e}")
+        raw = pd.read_excel(io.BytesIO(file_bytes), header=None, dtype=str,
+                            engine=EXCEL_READ_ENGINE)
+    except Exception:
+        try:
+            raw = pd.read_excel(io.BytesIO(file_bytes), header=None, dtype=str,
+                                engine="openpyxl")
+        except Exception as e:
+            raise RuntimeError(f"Gagal baca Excel stok: {e}")
 
     if raw.empty:
         return {}, {}, []
@@ -1860,14 +1936,12 @@ def parse_stok_file(file_bytes):
         ncol = df.shape[1]
         pn_i  = 0
         stk_i = 3 if ncol > 3 else (ncol - 1)
-        stok_cache = {}
-        for _, row in df.iterrows():
-            pn = str(row.iloc[pn_i]).strip().upper()
-            if not pn or pn in ("NAN", "NONE"):
-                continue
-            val = row.iloc[stk_i]
-            stok_cache[pn] = "—" if pd.isna(val) else str(val).strip()
-        return stok_cache, {}, []
+        # Vectorized (tanpa iterrows): normalisasi kolom sekali, lalu dict(zip).
+        pn   = df.iloc[:, pn_i].fillna("").astype(str).str.strip().str.upper()
+        val  = df.iloc[:, stk_i]
+        stok = val.fillna("").astype(str).str.strip().where(val.notna(), "—")
+        keep = (pn != "") & ~pn.isin(("NAN", "NONE"))
+        return dict(zip(pn[keep], stok[keep])), {}, []
 
     # ── FORMAT MULTI-GUDANG ──────────────────────────────────────────
     headers = [str(x).strip() if not pd.isna(x) else "" for x in raw.iloc[header_idx]]
@@ -1886,115 +1960,279 @@ def parse_stok_file(file_bytes):
 
     gudang_names = [name for _, name in gudang_cols]
 
+    # Vectorized per kolom (bukan raw.iloc per baris): normalisasi Kode
+    # Barang + konversi qty semua gudang sekali jalan, loop Python tinggal
+    # merakit dict per PN.
+    body  = raw.iloc[header_idx + 1:]
+    kode  = body.iloc[:, kode_i]
+    kode_s = kode.fillna("").astype(str).str.strip()
+    pn    = kode_s.str.replace(_KODE_PREFIX_RE, "", regex=True).str.strip().str.upper()
+    keep  = (
+        kode.notna().to_numpy()
+        & (kode_s != "").to_numpy()
+        & ~kode_s.str.lower().isin(("nan", "none")).to_numpy()
+        & (pn != "").to_numpy()
+    )
+
+    qty = (
+        np.column_stack([_stok_column_to_int(body.iloc[:, ci]) for ci, _ in gudang_cols])
+        if gudang_cols else np.zeros((len(body), 0), dtype=np.int64)
+    )
+    # Total: pakai kolom Total kalau ada, kalau tidak jumlahkan semua gudang
+    if total_i is not None:
+        totals = _stok_column_to_int(body.iloc[:, total_i])
+    else:
+        totals = qty.sum(axis=1)
+
     stok_cache   = {}
     gudang_cache = {}
-    for ri in range(header_idx + 1, len(raw)):
-        row  = raw.iloc[ri]
-        kode = str(row.iloc[kode_i]).strip()
-        if not kode or kode.lower() in ("nan", "none"):
-            continue
-        pn = _KODE_PREFIX_RE.sub("", kode).strip().upper()
-        if not pn:
-            continue
+    for pn_v, total_val, q_row in zip(
+        pn.to_numpy()[keep].tolist(), totals[keep].tolist(), qty[keep].tolist()
+    ):
+        stok_cache[pn_v]   = str(total_val)
+        gudang_cache[pn_v] = {name: q for name, q in zip(gudang_names, q_row) if q != 0}
 
-        # Total: pakai kolom Total kalau ada, kalau tidak jumlahkan semua gudang
-        if total_i is not None:
-            total_val = _stok_to_int(row.iloc[total_i])
-        else:
-            total_val = sum(_stok_to_int(row.iloc[ci]) for ci, _ in gudang_cols)
+    return stok_cache, gudang_cache, gudang_names
 
-        breakdown = {}
-        for ci, name in gudang_cols:
-            q = _stok_to_int(row.iloc[ci])
-            if q != 0:
-                breakdown[name] = q
 
-        stok_cache[pn] = str(total_val)
-        gudang_cache[pn] = breakdown
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _parse_stok_shared(digest: str, _file_bytes: bytes):
+    """
+    `parse_stok_file` yang di-share antar session, key = md5 isi file
+    (argumen berawalan _ tidak di-hash Streamlit). Tiap session baru tetap
+    download stok.xlsx, tapi parse (~4 detik untuk 60k baris × 25 gudang)
+    cukup sekali per isi file — stok.xlsx baru → md5 beda → parse ulang.
+    Hasilnya dipakai read-only.
+    """
+    return parse_stok_file(_file_bytes)
+
+
+def parse_harga_file(file_bytes):
+    """Parse harga.xlsx → (DataFrame PN/Name/Harga, lookup {PN: "Rp …"})."""
+    # Filter usecols supaya hanya kolom relevan (PN/Name/Harga) yang
+    # di-load ke RAM. harga.xlsx user biasanya punya banyak kolom
+    # tambahan (kategori, supplier, dll) yang tidak dipakai.
+    def _is_useful_col(name) -> bool:
+        cl = str(name).strip().lower()
+        return any(kw in cl for kw in (
+            "part number", "partnumber", "no part", "kode",
+            "part name", "nama", "deskripsi",
+            "harga", "price",
+        ))
+    df_h = pd.read_excel(
+        io.BytesIO(file_bytes), dtype=str, usecols=_is_useful_col
+    )
+    df_h.columns = [c.strip() for c in df_h.columns]
+    col_map = {}
+    for c in df_h.columns:
+        cl = c.lower()
+        if "part number" in cl or "partnumber" in cl or "no part" in cl or "kode" in cl:
+            col_map[c] = "Part Number"
+        elif "part name" in cl or "nama" in cl or "deskripsi" in cl:
+            col_map[c] = "Part Name"
+        elif "harga" in cl or "price" in cl:
+            col_map[c] = "Harga"
+    df_h = df_h.rename(columns=col_map)
+    for req in ("Part Number", "Part Name", "Harga"):
+        if req not in df_h.columns:
+            df_h[req] = ""
+    df_h["Part Number"] = df_h["Part Number"].astype(str).str.strip().str.upper()
+    df_h = df_h.dropna(subset=["Part Number"])
+    df_h = df_h[df_h["Part Number"] != ""]
+    df_h = df_h.reset_index(drop=True)
+    # Bangun lookup dict sekali di sini
+    lookup = {}
+    for pn_key, harga_val in zip(df_h["Part Number"], df_h["Harga"]):
+        try:
+            num = float(str(harga_val).replace(",", "").strip())
+            lookup[pn_key] = f"Rp {num:,.0f}"
+        except Exception:
+            lookup[pn_key] = str(harga_val) if pd.notna(harga_val) else "—"
+    return df_h, lookup
 
-    return stok_cache, gudang_cache, gudang_names
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _parse_harga_shared(digest: str, _file_bytes: bytes):
+    """
+    Sama seperti `_parse_stok_shared`: parse harga.xlsx sekali per isi file
+    (key = md5), dipakai read-only oleh semua session.
+    """
+    return parse_harga_file(_file_bytes)
 
 
 # ── Search Functions ────────────────────────────────────────────────
-def search_part_number(term, excel_files, stok_cache, harga_lookup=None):
-    results, seen = [], set()
+_NAME_SEARCH_LIMITS = [100, 500, 1000, 5000, 20000]
+
+def _pn_index_first_rows(term_up, excel_files, search_index):
+    """
+    {file_idx: row_idx pertama yang PN-nya mengandung term_up} via index
+    trigram. Return None kalau index tidak bisa dipakai (query < 3 huruf).
+    """
+    matches = trigram_matches(term_up, search_index["pn"])
+    if matches is None:
+        return None
+    postings = search_index["pn"]["postings"]
+    first_rows = {}
+    for pn in matches:
+        for fi_idx in postings[pn]:
+            fi_idx = int(fi_idx)
+            row_idx = excel_files[fi_idx]["part_number_index"][pn][0]
+            if row_idx < first_rows.get(fi_idx, row_idx + 1):
+                first_rows[fi_idx] = row_idx
+    return first_rows
+
+
+def _name_index_candidate_files(term_up, search_index):
+    """
+    Set file_idx yang punya Part Name mengandung term_up, atau None kalau
+    index tidak bisa dipakai (query < 3 huruf) — berarti scan semua sheet.
+    """
+    matches = trigram_matches(term_up, search_index["name"])
+    if matches is None:
+        return None
+    postings = search_index["name"]["postings"]
+    cand = set()
+    for nm in matches:
+        cand.update(postings[nm].tolist())
+    return cand
+
+
+def _joined_find_rows(joined, offsets, needle):
+    """
+    Yield index baris (urut naik) yang mengandung needle. str.find berulang
+    atas kolom gabungan; setelah hit lompat ke awal baris berikutnya, jadi
+    tiap baris paling banyak sekali.
+    """
+    n   = len(offsets)
+    pos = joined.find(needle)
+    while pos >= 0:
+        row = int(np.searchsorted(offsets, pos, side="right")) - 1
+        yield row
+        if row + 1 >= n:
+            return
+        pos = joined.find(needle, int(offsets[row + 1]))
+
+
+# Hasil search disimpan kolom-per-kolom (dict of lists), bukan list of dict:
+# query umum bisa ribuan hit, dan pd.DataFrame(cols) tinggal bungkus list
+# yang sudah kolumnar. Hasil kosong = {} supaya cek `if results:` tetap jalan.
+_RESULT_COLUMNS = (
+    "File", "Path", "Sheet", "Part Number", "Part Name", "Quantity",
+    "Stok", "Harga", "Excel Row", "Full Path",
+)
+
+
+def _result_count(results):
+    """Jumlah baris hasil search (dict of lists dari `search_part_*`)."""
+    return len(results["File"]) if results else 0
+
+
+def _append_result_rows(cols, fi, rows):
+    """
+    Tambah baris hasil `rows` (list row_idx urut naik) dari sheet `fi`
+    sekaligus — kolom per-sheet cukup di-extend; PN/Name/Qty sudah string
+    siap tampil sejak index dibangun. Kolom Stok/Harga diisi belakangan
+    oleh `_fill_stok_harga`.
+    """
+    n = len(rows)
+    cols["File"].extend([fi["simple_name"]] * n)
+    cols["Path"].extend([fi["relative_path"]] * n)
+    cols["Sheet"].extend([fi["sheet"]] * n)
+    cols["Part Number"].extend(fi["part_number_arr"][rows].tolist())
+    cols["Part Name"].extend(fi["part_name_arr"][rows].tolist())
+    cols["Quantity"].extend(fi["quantity_arr"][rows].tolist())
+    cols["Excel Row"].extend([i + 2 for i in rows])
+    cols["Full Path"].extend([fi["full_path"]] * n)
+
+
+def _fill_stok_harga(cols, stok_cache, harga_lookup):
+    """Isi kolom Stok/Harga untuk semua hasil dalam 1 pass (lookup per PN upper)."""
+    keys = [pn.upper() for pn in cols["Part Number"]]
+    stok_get, harga_get = (stok_cache or {}).get, harga_lookup.get
+    cols["Stok"]  = [stok_get(k, "—") for k in keys]
+    cols["Harga"] = [harga_get(k, "—") for k in keys]
+    return cols
+
+
+def search_part_number(term, excel_files, stok_cache, harga_lookup=None, search_index=None,
+                       max_results=None):
+    """
+    Cari berdasarkan Part Number (substring, case-insensitive) — 1 hasil
+    per file (baris pertama yang cocok). Return dict of lists, lihat
+    `_RESULT_COLUMNS`.
+    """
     term_up = term.strip().upper()
     if not term_up:
-        return results
+        return {}
 
     harga_lookup = harga_lookup or {}
+    cols, seen = {c: [] for c in _RESULT_COLUMNS}, set()
+
+    first_rows = (
+        _pn_index_first_rows(term_up, excel_files, search_index) if search_index else None
+    )
+    if first_rows is not None:
+        for fi_idx in sorted(first_rows):
+            fi = excel_files[fi_idx]
+            if fi["simple_name"] in seen:
+                continue
+            _append_result_rows(cols, fi, [first_rows[fi_idx]])
+            seen.add(fi["simple_name"])
+            if max_results and len(seen) >= max_results:
+                break
+        return _fill_stok_harga(cols, stok_cache, harga_lookup) if seen else {}
 
     for fi in excel_files:
         sn = fi["simple_name"]
         if sn in seen:
             continue
-        df = fi["dataframe"]
-        for indexed_pn, indices in fi.get("part_number_index", {}).items():
-            if term_up in indexed_pn:
-                row        = df.iloc[indices[0]]
-                pn_value   = str(row["part_number"]).strip() if pd.notna(row["part_number"]) else "N/A"
-                stok_value = stok_cache.get(pn_value.upper(), "—") if stok_cache else "—"
-                harga_value = harga_lookup.get(pn_value.upper(), "—")
-                results.append({
-                    "File": sn, "Path": fi["relative_path"], "Sheet": fi["sheet"],
-                    "Part Number": pn_value,
-                    "Part Name": str(row["part_name"]) if pd.notna(row["part_name"]) else "N/A",
-                    "Quantity": str(row["quantity"]) if pd.notna(row["quantity"]) else "N/A",
-                    "Stok": stok_value, "Harga": harga_value,
-                    "Excel Row": indices[0] + 2, "Full Path": fi["full_path"]
-                })
-                seen.add(sn)
-                break
-    return results
+        # Kemunculan pertama di kolom PN gabungan = baris pertama yang cocok.
+        idx = next(_joined_find_rows(fi["pn_joined"], fi["pn_offsets"], term_up), None)
+        if idx is None:
+            continue
+        _append_result_rows(cols, fi, [idx])
+        seen.add(sn)
+        if max_results and len(seen) >= max_results:
+            break
+    return _fill_stok_harga(cols, stok_cache, harga_lookup) if seen else {}
 
 
-def search_part_name(term, excel_files, stok_cache, harga_lookup=None):
+def search_part_name(term, excel_files, stok_cache, harga_lookup=None, search_index=None,
+                     max_results=None):
     """
-    Cari berdasarkan Part Name.
+    Cari berdasarkan Part Name (substring, case-insensitive). Return dict
+    of lists, lihat `_RESULT_COLUMNS`.
+    `search_index` (opsional): index trigram dari `build_search_index` —
+    sheet yang pasti tidak punya nama cocok di-skip tanpa di-scan.
+    `max_results` (opsional): berhenti scan begitu hasil sebanyak ini
+    terkumpul — query umum ("BOLT") tidak perlu scan semua sheet.
     """
-    results = []
     term_up = term.strip().upper()
     if not term_up:
-        return results
+        return {}
 
     harga_lookup = harga_lookup or {}
-    search_keywords = [term.strip().lower()]
+    cols = {c: [] for c in _RESULT_COLUMNS}
+    n_hits = 0
+    cand_files = (
+        _name_index_candidate_files(term_up, search_index) if search_index else None
+    )
 
-    for fi in excel_files:
-        df  = fi["dataframe"]
-        pni = fi.get("part_name_index", {})
-        matching_indices = set()
-
-        for keyword in search_keywords:
-            kw_up        = keyword.upper()
-            search_words = kw_up.split()
-            for word in pni.keys():
-                for sw in search_words:
-                    if sw in word or word in sw:
-                        matching_indices.update(pni[word])
-            # Fallback untuk keyword pendek (≤3 huruf)
-            if not matching_indices and len(kw_up) <= 3:
-                for idx, row in df.iterrows():
-                    pname = str(row["part_name"]) if pd.notna(row["part_name"]) else ""
-                    if kw_up in pname.upper():
-                        matching_indices.add(idx)
-
-        for idx in matching_indices:
-            row   = df.iloc[idx]
-            pname = str(row["part_name"]) if pd.notna(row["part_name"]) else ""
-            # Harus cocok dengan keyword
-            matched = any(kw.upper() in pname.upper() for kw in search_keywords)
-            if matched:
-                pn_value   = str(row["part_number"]).strip() if pd.notna(row["part_number"]) else "N/A"
-                stok_value = stok_cache.get(pn_value.upper(), "—") if stok_cache else "—"
-                harga_value = harga_lookup.get(pn_value.upper(), "—")
-                results.append({
-                    "File": fi["simple_name"], "Path": fi["relative_path"], "Sheet": fi["sheet"],
-                    "Part Number": pn_value, "Part Name": pname if pname else "N/A",
-                    "Quantity": str(row["quantity"]) if pd.notna(row["quantity"]) else "N/A",
-                    "Stok": stok_value, "Harga": harga_value, "Excel Row": idx + 2, "Full Path": fi["full_path"]
-                })
-    return results
+    for fi_idx, fi in enumerate(excel_files):
+        if cand_files is not None and fi_idx not in cand_files:
+            continue
+        rows = []
+        for idx in _joined_find_rows(fi["name_joined"], fi["name_offsets"], term_up):
+            rows.append(idx)
+            if max_results and n_hits + len(rows) >= max_results:
+                break
+        if not rows:
+            continue
+        _append_result_rows(cols, fi, rows)
+        n_hits += len(rows)
+        if max_results and n_hits >= max_results:
+            break
+    return _fill_stok_harga(cols, stok_cache, harga_lookup) if n_hits else {}
 
 
 # ── Build Excel Functions ───────────────────────────────────────────
@@ -2005,7 +2243,6 @@ def build_catalog_excel(df_result: pd.DataFrame, progress_callback=None, all_par
     from openpyxl.utils import get_column_letter
     from openpyxl.drawing.image import Image as XLImage
     from PIL import Image as PILImage
-    import tempfile
 
     wb = Workbook()
     ws = wb.active
@@ -2066,15 +2303,16 @@ def build_catalog_excel(df_result: pd.DataFrame, progress_callback=None, all_par
             w_px   = int(w_px * ratio)
             h_px   = max_h
             pil_img = pil_img.resize((w_px, h_px), PILImage.LANCZOS)
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        pil_img.save(tmp.name, format="PNG")
-        tmp.close()
-        xl = XLImage(tmp.name)
+        # PNG di-encode ke memori — openpyxl baca ulang dari BytesIO saat
+        # wb.save(), tidak perlu temp file di disk.
+        png = io.BytesIO()
+        pil_img.save(png, format="PNG")
+        png.seek(0)
+        xl = XLImage(png)
         xl.width  = w_px
         xl.height = h_px
-        return xl, w_px, h_px, tmp.name
+        return xl, w_px, h_px
 
-    tmp_files = []
     row_idx   = 2
     total_pn  = len(grouped_list)
 
@@ -2097,17 +2335,15 @@ def build_catalog_excel(df_result: pd.DataFrame, progress_callback=None, all_par
                     if urls:
                         b1, _ = ExcelSearchApp.fetch_image_bytes(urls[0])
                         if b1:
-                            xl, w, h, tmp_path = _make_xl_image(b1)
+                            xl, w, h = _make_xl_image(b1)
                             img_d = xl
-                            tmp_files.append(tmp_path)
                             row_height = max(int(h * 0.75) + 10, row_height)
                             hash1 = hashlib.md5(b1).hexdigest()
                             for url2 in urls[1:]:
                                 b2, _ = ExcelSearchApp.fetch_image_bytes(url2)
                                 if b2 and hashlib.md5(b2).hexdigest() != hash1:
-                                    xl, w, h, tmp_path = _make_xl_image(b2)
+                                    xl, w, h = _make_xl_image(b2)
                                     img_e = xl
-                                    tmp_files.append(tmp_path)
                                     row_height = max(int(h * 0.75) + 10, row_height)
                                     break
 
@@ -2149,16 +2385,7 @@ def build_catalog_excel(df_result: pd.DataFrame, progress_callback=None, all_par
     ws.freeze_panes = "A2"
     buf = io.BytesIO()
     wb.save(buf)
-    buf.seek(0)
-    result = buf.getvalue()
-
-    for f in tmp_files:
-        try:
-            os.unlink(f)
-        except Exception:
-            pass
-
-    return result
+    return buf.getvalue()
 
 
 def make_template_excel() -> bytes:
@@ -2179,48 +2406,128 @@ def make_template_excel() -> bytes:
     return buf.getvalue()
 
 
+def _df_xlsx_download_data(df: pd.DataFrame):
+    """
+    Callable untuk `st.download_button(data=...)`: xlsx baru di-generate
+    saat tombol diklik (di thread terpisah), bukan di tiap rerun — tabel
+    besar tidak bikin halaman lambat walau tidak ada yang download.
+    """
+    def _build() -> bytes:
+        buf = io.BytesIO()
+        df.to_excel(buf, index=False, engine="openpyxl")
+        return buf.getvalue()
+    return _build
+
+
+_EXCEL_EXT = (".xlsx", ".xls", ".xlsm")
+
+
+def _iter_excel_entries(root):
+    """
+    Walk rekursif pakai os.scandir — DirEntry sudah bawa tipe dari dirent,
+    jadi tidak ada stat() ekstra per entry seperti os.walk. Symlink folder
+    tidak diikuti (sama dengan default os.walk).
+    """
+    try:
+        with os.scandir(root) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    yield from _iter_excel_entries(e.path)
+                elif e.name.lower().endswith(_EXCEL_EXT):
+                    yield e
+    except OSError:
+        return
+
+
 # ── Shared Excel Index (cross-session, RAM-efficient) ───────────────
 # Sebelum-nya index 421 file Excel disimpan di st.session_state PER user
 # (~500 MB/user) → 2–3 user concurrent langsung kena resource limit
 # Streamlit Cloud (~1 GB). @st.cache_resource simpan 1 copy di proses
 # yang dishare ke semua session. RAM cuma sekali untuk semua user.
+@st.cache_data(ttl=30, show_spinner=False)
+def _data_folder_watermark(data_folder_str: str) -> tuple:
+    """
+    (jumlah file Excel, signature path+size+mtime_ns semua file) di data
+    folder. Dipakai sebagai bagian cache key index: file baru/dihapus/
+    di-rename/diedit in-place (termasuk diganti file dengan mtime lebih
+    lama) → watermark berubah → index di-rebuild otomatis (file yang tidak
+    berubah dipakai ulang, lihat _index_entry_memo). TTL 30 detik supaya
+    walk + stat tidak jalan di setiap rerun.
+    """
+    sig = hashlib.md5()
+    count = 0
+    for entry in sorted(_iter_excel_entries(data_folder_str), key=lambda e: e.path):
+        count += 1
+        try:
+            stat = entry.stat()
+            sig.update(f"{entry.path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        except OSError:
+            sig.update(f"{entry.path}\0?\n".encode())
+    return count, sig.hexdigest()
+
+
+@st.cache_resource(show_spinner=False)
+def _index_entry_memo() -> dict:
+    """
+    {cache_key file: list entry} dari build index terakhir, share antar
+    session. Waktu watermark berubah, file yang key-nya sama dipakai ulang
+    langsung dari RAM — rebuild cuma parse/unpickle file yang berubah.
+    Entry-nya objek yang sama dengan index aktif, jadi tidak makan RAM lagi.
+    """
+    return {}
+
+
 @st.cache_resource(
+    max_entries=1,
     show_spinner="📚 Memuat index Excel (sekali saja, di-share ke semua user)..."
 )
-def _load_excel_index_shared(data_folder_str: str, _processor):
+def _load_excel_index_shared(data_folder_str: str, watermark: tuple):
     """
     Walk data folder, parse semua .xlsx/.xls/.xlsm, return list entry per
-    sheet. Cached antar session — re-run cuma terjadi kalau cache di-clear
-    (mis. lewat tombol Refresh Data).
-
-    Parameter `_processor` di-prefix underscore supaya Streamlit skip dari
-    hashing key (callable tidak bisa di-hash konsisten). Cache key efektif
-    cuma `data_folder_str`.
+    sheet + index trigram PN/Part Name global (lihat `build_search_index`).
+    Cached antar session — re-run cuma terjadi kalau `watermark` berubah atau cache
+    di-clear (mis. lewat tombol Refresh Data). max_entries=1 supaya index
+    lama langsung dibuang begitu index baru terbentuk.
     """
     data_folder = Path(data_folder_str)
-    excel_ext = (".xlsx", ".xls", ".xlsm")
     all_files = []
-    for root, _, files in os.walk(data_folder):
-        for f in files:
-            if f.lower().endswith(excel_ext):
-                fp = Path(root) / f
-                all_files.append((fp, fp.relative_to(data_folder)))
+    for entry in _iter_excel_entries(data_folder_str):
+        fp = Path(entry.path)
+        # Key cache dihitung sekali di sini dari stat DirEntry, dipakai
+        # ulang untuk load, save, dan prune pickle.
+        try:
+            fh = _file_cache_key(fp, entry.stat())
+        except OSError:
+            fh = None
+        all_files.append((fp, fp.relative_to(data_folder), fh))
 
+    memo = _index_entry_memo()
     if not all_files:
-        return [], 0, datetime.now()
+        memo.clear()
+        return [], 0, datetime.now(), build_search_index([])
+
+    results, by_key = _index_excel_files(all_files, reuse=memo)
+    memo.clear()
+    memo.update(by_key)
+    file_keys = [fh for _, _, fh in all_files]
+    if all(file_keys):
+        index_key = _search_index_cache_key(results, file_keys)
+        _prune_orphan_pickle_cache(set(file_keys) | {index_key})
+        search_index = _load_or_build_search_index(results, index_key)
+    else:
+        _prune_orphan_pickle_cache(set(file_keys))
+        search_index = build_search_index(results)
+    return results, len(all_files), datetime.now(), search_index
 
-    results = []
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = {executor.submit(_processor, fp, rp): fp for fp, rp in all_files}
-        for future in as_completed(futures):
-            try:
-                res = future.result()
-                if res:
-                    results.extend(res)
-            except Exception:
-                pass
 
-    return results, len(all_files), datetime.now()
+# Worker parse Excel: I/O (unzip + baca disk) overlap antar file. Default
+# ThreadPoolExecutor (cpu+4) dibatasi 8 supaya peak RAM parse paralel tetap
+# aman di Streamlit Cloud.
+_INDEX_MAX_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+# Sengaja tidak pakai process pool: fork dari server Streamlit (thread
+# tornado + script thread session lain + torch) rawan deadlock, dan
+# spawn/forkserver bakal re-exec app.py (Streamlit memasangnya sebagai
+# __main__) di tiap worker.
 
 
 # ── Pickle disk cache size limit (LRU eviction) ─────────────────────
@@ -2230,6 +2537,144 @@ def _load_excel_index_shared(data_folder_str: str, _processor):
 # `.cache/*.pkl` di bawah cap dengan eviction LRU (by mtime).
 _PICKLE_CACHE_MAX_MB = 500
 
+# Naikkan setiap kali struktur entry index (dict per sheet) berubah — masuk
+# ke key cache, jadi pickle lama otomatis tidak terpakai lagi (orphan).
+_INDEX_CACHE_VERSION = 8
+
+
+def _file_cache_key(fp, stat):
+    """
+    Key pickle cache per file Excel dari hasil stat: path + size + mtime_ns
+    (+ versi index). Tidak baca isi file; md5 cuma supaya nama file .pkl
+    pendek & aman untuk path apa pun (~1 µs per file).
+    """
+    return hashlib.md5(
+        f"{fp}_{stat.st_size}_{stat.st_mtime_ns}_v{_INDEX_CACHE_VERSION}".encode()
+    ).hexdigest()
+
+
+def _load_index_cache(fh):
+    """Entry index dari pickle cache `fh`, atau None kalau belum ada/korup."""
+    if not fh:
+        return None
+    try:
+        with open(CACHE_FOLDER / f"{fh}.pkl", "rb") as f:
+            return intern_strings(unpack_from_cache(pickle.load(f)))
+    except Exception:
+        return None
+
+
+def _save_index_cache(fh, data) -> None:
+    if not fh:
+        return
+    try:
+        with open(CACHE_FOLDER / f"{fh}.pkl", "wb") as f:
+            pickle.dump(pack_for_cache(data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Setelah tiap save, cek total cache size — evict yang paling tua
+        # kalau lewat cap. Hindari disk full di Streamlit Cloud.
+        _enforce_pickle_cache_size_limit()
+    except Exception:
+        pass
+
+
+def _search_index_cache_key(results, file_keys):
+    """
+    Key pickle index global: cache key semua file + urutan (path, sheet)
+    entry. Posting menyimpan posisi entry di `results`, jadi urutannya
+    ikut di-hash.
+    """
+    sig = hashlib.md5(f"search_index_v{_INDEX_CACHE_VERSION}\n".encode())
+    for fh in file_keys:
+        sig.update(f"{fh}\n".encode())
+    for e in results:
+        sig.update(f"{e['relative_path']}\0{e['sheet']}\n".encode())
+    return "search_index_" + sig.hexdigest()
+
+
+def _load_or_build_search_index(results, key):
+    """
+    `build_search_index(results)` dengan pickle cache `.cache/{key}.pkl`
+    (format CSR, lihat `pack_search_index`). Restart app tanpa perubahan
+    data cukup load ~0.06 s, bukan build ulang ~1.2 s.
+    """
+    path = CACHE_FOLDER / f"{key}.pkl"
+    try:
+        with open(path, "rb") as f:
+            return unpack_search_index(pickle.load(f))
+    except Exception:
+        pass
+    index = build_search_index(results)
+    try:
+        with open(path, "wb") as f:
+            pickle.dump(pack_search_index(index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        _enforce_pickle_cache_size_limit()
+    except Exception:
+        pass
+    return index
+
+
+def _index_excel_files(all_files, reuse=None):
+    """
+    [(file_path, relative_path, cache_key)] → (list entry index semua sheet,
+    {cache_key: entry file tsb}). File yang key-nya ada di `reuse` (hasil
+    build sebelumnya) dipakai ulang apa adanya. Cache hit di-load dan cache
+    miss di-parse via thread pool, hasil parse di-save ke pickle cache.
+    """
+    reuse = reuse or {}
+    per_file, misses, by_key = [None] * len(all_files), [], {}
+    to_load = [fh for _, _, fh in all_files if fh not in reuse]
+    with ThreadPoolExecutor(max_workers=min(_INDEX_MAX_WORKERS, max(len(to_load), 1))) as executor:
+        loaded = dict(zip(to_load, executor.map(_load_index_cache, to_load)))
+    for i, (fp, rp, fh) in enumerate(all_files):
+        cached = reuse[fh] if fh in reuse else loaded[fh]
+        if cached:
+            per_file[i] = cached
+            by_key[fh] = cached
+        else:
+            misses.append((i, fp, rp, fh))
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(_INDEX_MAX_WORKERS, len(misses))) as executor:
+            futures = {executor.submit(index_excel_file, fp, rp): (i, fp, rp, fh)
+                       for i, fp, rp, fh in misses}
+            for future in as_completed(futures):
+                i, fp, rp, fh = futures[future]
+                try:
+                    res = future.result()
+                except Exception:
+                    res = None
+                if res:
+                    # Save dulu baru intern: pickle dari string yang sudah
+                    # di-intern (objek dipakai berulang) malah lebih lambat di-load.
+                    _save_index_cache(fh, res)
+                    intern_strings(res)
+                    per_file[i] = res
+                    if fh:
+                        by_key[fh] = res
+
+    # Gabung per file dalam urutan walk (bukan urutan selesai parse) supaya
+    # posisi entry — dan key pickle index global — sama antara cold & warm start.
+    results = [e for res in per_file if res for e in res]
+    return results, by_key
+
+
+def _prune_orphan_pickle_cache(live_keys) -> None:
+    """
+    Hapus `.cache/*.pkl` yang key-nya tidak cocok dengan file Excel mana pun
+    di walk terakhir (file dihapus/diedit, atau versi index lama). Tanpa ini
+    orphan cuma hilang kalau total cache lewat cap LRU.
+    """
+    try:
+        for cf in CACHE_FOLDER.glob("*.pkl"):
+            if cf.stem not in live_keys:
+                try:
+                    cf.unlink()
+                except Exception:
+                    pass
+    except Exception:
+        pass
+
+
 def _enforce_pickle_cache_size_limit(max_mb: int = _PICKLE_CACHE_MAX_MB) -> None:
     try:
         files = sorted(
@@ -2271,7 +2716,7 @@ class ExcelSearchApp:
 
         if "excel_files" not in st.session_state:
             st.session_state.index_data         = []
-            st.session_state.search_results     = []
+            st.session_state.search_results     = {}
             st.session_state.file_hashes        = {}
 
         # SELALU overwrite excel_files dengan reference dari shared cache —
@@ -2283,10 +2728,11 @@ class ExcelSearchApp:
         #      bakal nahan stale copy itu di RAM. Assign unconditional bikin
         #      Python GC bebasin copy lama begitu reference terakhir hilang.
         # Semua user end up share 1 list yang sama di RAM.
-        results, n_total_files, idx_time = _load_excel_index_shared(
-            str(self.data_folder), self.process_single_file
+        results, n_total_files, idx_time, search_index = _load_excel_index_shared(
+            str(self.data_folder), _data_folder_watermark(str(self.data_folder)),
         )
         st.session_state.excel_files        = results
+        st.session_state.search_index       = search_index
         st.session_state.loaded_files_count = len(results)
         st.session_state.last_file_count    = n_total_files
         st.session_state.last_index_time    = idx_time
@@ -2295,38 +2741,6 @@ class ExcelSearchApp:
         if not self.data_folder.exists():
             self.data_folder.mkdir(parents=True)
 
-    def get_file_hash(self, fp):
-        try:
-            s = fp.stat()
-            return hashlib.md5(f"{fp}_{s.st_size}_{s.st_mtime}".encode()).hexdigest()
-        except Exception:
-            return None
-
-    def load_file_cache(self, fp, fh):
-        cf = self.cache_folder / f"{fh}.pkl"
-        if cf.exists():
-            try:
-                with open(cf, "rb") as f:
-                    return pickle.load(f)
-            except Exception:
-                return None
-        return None
-
-    def save_file_cache(self, fp, fh, data):
-        try:
-            with open(self.cache_folder / f"{fh}.pkl", "wb") as f:
-                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
-            # Setelah tiap save, cek total cache size — evict yang paling tua
-            # kalau lewat cap. Hindari disk full di Streamlit Cloud.
-            _enforce_pickle_cache_size_limit()
-        except Exception:
-            pass
-
-    @staticmethod
-    def extract_simple_filename(filename):
-        name = os.path.splitext(filename)[0]
-        return name.split(" - ")[-1] if " - " in name else name
-
     def normalize_base_part_number(self, pn):
         if not pn or pd.isna(pn):
             return ""
@@ -2411,6 +2825,24 @@ class ExcelSearchApp:
   <div style="font-size:.78rem;color:#666;margin-top:4px;">{safe_caption}</div>
 </div>""", unsafe_allow_html=True)
 
+    @staticmethod
+    @st.cache_data(max_entries=400, show_spinner=False)
+    def thumbnail_b64(img_bytes: bytes, max_side: int = 600) -> str:
+        """
+        Thumbnail WebP (sisi terpanjang ≤ max_side) dalam base64, untuk grid
+        gambar yang tidak butuh zoom. Decode + resize full-res cukup sekali
+        per gambar; rerun berikutnya tinggal ambil string dari cache.
+        """
+        import base64
+        from PIL import Image as PILImage
+        img = PILImage.open(io.BytesIO(img_bytes))
+        img.thumbnail((max_side, max_side))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="WEBP", quality=85)
+        return base64.b64encode(buf.getvalue()).decode()
+
     @staticmethod
     @st.cache_data(ttl=1800, max_entries=200, show_spinner=False)
     def fetch_image_bytes(url: str):
@@ -2485,7 +2917,9 @@ class ExcelSearchApp:
 
         # ── Parse Excel (auto-deteksi format lama / multi-gudang) ─────────
         try:
-            stok_cache, gudang_cache, gudang_names = parse_stok_file(file_bytes)
+            stok_cache, gudang_cache, gudang_names = _parse_stok_shared(
+                hashlib.md5(file_bytes).hexdigest(), file_bytes
+            )
             self._set_stok_cache(stok_cache, gudang_cache, gudang_names)
             if gudang_names:
                 print(f"[stok] ✅ Format multi-gudang: {len(stok_cache)} PN, "
@@ -2540,46 +2974,9 @@ class ExcelSearchApp:
             return
 
         try:
-            # Filter usecols supaya hanya kolom relevan (PN/Name/Harga) yang
-            # di-load ke RAM. harga.xlsx user biasanya punya banyak kolom
-            # tambahan (kategori, supplier, dll) yang tidak dipakai.
-            def _is_useful_col(name) -> bool:
-                cl = str(name).strip().lower()
-                return any(kw in cl for kw in (
-                    "part number", "partnumber", "no part", "kode",
-                    "part name", "nama", "deskripsi",
-                    "harga", "price",
-                ))
-            df_h = pd.read_excel(
-                io.BytesIO(file_bytes), dtype=str, usecols=_is_useful_col
+            self.harga_cache, self.harga_lookup = _parse_harga_shared(
+                hashlib.md5(file_bytes).hexdigest(), file_bytes
             )
-            df_h.columns = [c.strip() for c in df_h.columns]
-            col_map = {}
-            for c in df_h.columns:
-                cl = c.lower()
-                if "part number" in cl or "partnumber" in cl or "no part" in cl or "kode" in cl:
-                    col_map[c] = "Part Number"
-                elif "part name" in cl or "nama" in cl or "deskripsi" in cl:
-                    col_map[c] = "Part Name"
-                elif "harga" in cl or "price" in cl:
-                    col_map[c] = "Harga"
-            df_h = df_h.rename(columns=col_map)
-            for req in ("Part Number", "Part Name", "Harga"):
-                if req not in df_h.columns:
-                    df_h[req] = ""
-            df_h["Part Number"] = df_h["Part Number"].astype(str).str.strip().str.upper()
-            df_h = df_h.dropna(subset=["Part Number"])
-            df_h = df_h[df_h["Part Number"] != ""]
-            self.harga_cache = df_h.reset_index(drop=True)
-            # Bangun lookup dict sekali di sini
-            lookup = {}
-            for pn_key, harga_val in zip(df_h["Part Number"], df_h["Harga"]):
-                try:
-                    num = float(str(harga_val).replace(",", "").strip())
-                    lookup[pn_key] = f"Rp {num:,.0f}"
-                except Exception:
-                    lookup[pn_key] = str(harga_val) if pd.notna(harga_val) else "—"
-            self.harga_lookup = lookup
             st.session_state.harga_data   = self.harga_cache
             st.session_state.harga_lookup = self.harga_lookup
         except Exception as e:
@@ -2705,84 +3102,15 @@ class ExcelSearchApp:
                 },
             )
 
-            dl_buf = io.BytesIO()
-            df_display.to_excel(dl_buf, index=False, engine="openpyxl")
-            dl_buf.seek(0)
             st.download_button(
                 label="⬇️ Download Excel",
-                data=dl_buf.getvalue(),
+                data=_df_xlsx_download_data(df_display),
                 file_name=f"harga_sparepart_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 key="harga_download",
             )
 
 
-    def process_single_file(self, file_path, relative_path):
-        results     = []
-        file_name   = file_path.name
-        simple_name = self.extract_simple_filename(file_name)
-        file_hash   = self.get_file_hash(file_path)
-        if file_hash:
-            cached = self.load_file_cache(file_path, file_hash)
-            if cached:
-                return cached
-        try:
-            xls = pd.ExcelFile(file_path, engine="openpyxl")
-            for sheet_name in xls.sheet_names:
-                try:
-                    df = pd.read_excel(xls, sheet_name=sheet_name, usecols=[1,3,4], dtype=str)
-                    df.columns = ["part_number","part_name","quantity"]
-
-                    # Pre-normalize vectorized — 5–10× lebih cepat dari
-                    # iterrows + per-row str() pada 920k baris total.
-                    pn_series = (
-                        df["part_number"].fillna("").astype(str)
-                        .str.strip().str.upper()
-                    )
-                    nm_series = (
-                        df["part_name"].fillna("").astype(str)
-                        .str.strip().str.upper()
-                    )
-
-                    # pn_idx: dict[PN_upper, list[row_idx]]. Pakai groupby —
-                    # preserve order index per group dengan sort=False.
-                    pn_valid = pn_series[pn_series != ""]
-                    if len(pn_valid):
-                        pn_idx = (
-                            pn_valid.reset_index()
-                            .groupby("part_number", sort=False)["index"]
-                            .apply(list)
-                            .to_dict()
-                        )
-                    else:
-                        pn_idx = {}
-
-                    # nm_idx: per-row split tetap perlu loop (multi-key per row).
-                    # Pakai .items() pada Series (~itertuples speed) — masih
-                    # jauh lebih cepat dari iterrows + repeat str/strip/upper.
-                    nm_idx = {}
-                    for idx, nm in nm_series.items():
-                        if not nm:
-                            continue
-                        for word in nm.split():
-                            if len(word) > 2:
-                                nm_idx.setdefault(word, []).append(idx)
-                    results.append({
-                        "full_path": str(file_path), "file_name": file_name,
-                        "relative_path": str(relative_path), "simple_name": simple_name,
-                        "sheet": sheet_name, "dataframe": df, "row_count": len(df),
-                        "col_count": len(df.columns), "part_number_index": pn_idx,
-                        "part_name_index": nm_idx,
-                        "last_modified": datetime.fromtimestamp(file_path.stat().st_mtime),
-                    })
-                except Exception:
-                    continue
-        except Exception:
-            pass
-        if file_hash and results:
-            self.save_file_cache(file_path, file_hash, results)
-        return results
-
     def auto_load_excel_files(self):
         """
         Force-reload Excel index. Dipakai oleh tombol "🔄 Refresh Data" di
@@ -2793,11 +3121,17 @@ class ExcelSearchApp:
         try:
             self.create_data_folder()
             # Bust cache_resource supaya next call benar-benar walk lagi
+            _data_folder_watermark.clear()
             _load_excel_index_shared.clear()
-            results, n_total_files, idx_time = _load_excel_index_shared(
-                str(self.data_folder), self.process_single_file
+            # Memo entry juga dikosongkan — tombol Refresh menghapus pickle
+            # cache, jadi semua file harus benar-benar di-parse (dan di-save)
+            # ulang, bukan diambil dari RAM.
+            _index_entry_memo().clear()
+            results, n_total_files, idx_time, search_index = _load_excel_index_shared(
+                str(self.data_folder), _data_folder_watermark(str(self.data_folder)),
             )
             st.session_state.excel_files        = results
+            st.session_state.search_index       = search_index
             st.session_state.last_index_time    = idx_time
             st.session_state.loaded_files_count = len(results)
             st.session_state.last_file_count    = n_total_files
@@ -2833,13 +3167,14 @@ class ExcelSearchApp:
                 if sn_input:
                     with st.spinner("Mencari\u2026"):
                         st.session_state.search_results = search_part_number(
-                            sn_input, st.session_state.excel_files, self.stok_cache, self.harga_lookup)
+                            sn_input, st.session_state.excel_files, self.stok_cache, self.harga_lookup,
+                            search_index=st.session_state.get("search_index"))
                         st.session_state.search_type = "Part Number"
                         st.session_state.search_term = sn_input
                         _u = LoginManager.get_current_user() or {}
                         log_activity(_u.get("username", ""), "search_pn",
                                      target=sn_input,
-                                     details={"results": len(st.session_state.search_results or [])})
+                                     details={"results": _result_count(st.session_state.search_results)})
                         st.rerun()
                 else:
                     st.warning("Masukkan part number untuk mencari.")
@@ -2859,7 +3194,7 @@ class ExcelSearchApp:
             unsafe_allow_html=True,
         )
         with st.form(key="search_name_form", clear_on_submit=False):
-            col_input, col_btn = st.columns([4, 1])
+            col_input, col_max, col_btn = st.columns([4, 1.3, 1])
             with col_input:
                 name_input = st.text_input(
                     "Part Name",
@@ -2867,19 +3202,30 @@ class ExcelSearchApp:
                     key="name_input",
                     label_visibility="collapsed",
                 )
+            with col_max:
+                # Batas hasil: query umum berhenti scan lebih awal & tabel
+                # hasil tetap ringan dirender.
+                max_results = st.selectbox(
+                    "Maks. hasil", _NAME_SEARCH_LIMITS, index=_NAME_SEARCH_LIMITS.index(1000),
+                    key="name_max_results", label_visibility="collapsed",
+                    format_func=lambda n: f"Maks. {n:,}",
+                )
             with col_btn:
                 go = st.form_submit_button("\U0001f50d Cari", type="primary", use_container_width=True)
             if go:
                 if name_input:
                     with st.spinner("Mencari\u2026"):
                         st.session_state.search_results = search_part_name(
-                            name_input, st.session_state.excel_files, self.stok_cache, self.harga_lookup)
+                            name_input, st.session_state.excel_files, self.stok_cache, self.harga_lookup,
+                            search_index=st.session_state.get("search_index"),
+                            max_results=max_results)
+                        st.session_state.search_limit = max_results
                         st.session_state.search_type = "Part Name"
                         st.session_state.search_term = name_input
                         _u = LoginManager.get_current_user() or {}
                         log_activity(_u.get("username", ""), "search_name",
                                      target=name_input,
-                                     details={"results": len(st.session_state.search_results or [])})
+                                     details={"results": _result_count(st.session_state.search_results)})
                         st.rerun()
                 else:
                     st.warning("Masukkan nama part untuk mencari.")
@@ -2893,9 +3239,9 @@ class ExcelSearchApp:
         idx_time = st.session_state.get("last_index_time")
         idx_str  = idx_time.strftime("%H:%M:%S") if idx_time else "—"
         excel_files = st.session_state.get("excel_files", []) or []
-        # Estimasi part: jumlah row dari semua dataframe (jika tersedia)
+        # Estimasi part: jumlah row dari semua sheet
         try:
-            est_parts = sum(len(fi.get("dataframe", [])) for fi in excel_files)
+            est_parts = sum(fi.get("row_count", 0) for fi in excel_files)
         except Exception:
             est_parts = 0
         try:
@@ -3358,9 +3704,17 @@ class ExcelSearchApp:
                     )
                     continue
                 try:
-                    st.image(b, use_container_width=True)
-                except Exception as e:
-                    st.error(f"Gagal render gambar #{idx+1}: {e}")
+                    b64 = ExcelSearchApp.thumbnail_b64(b)
+                    st.markdown(
+                        f'<img src="data:image/webp;base64,{b64}" '
+                        f'style="width:100%;border-radius:6px;" />',
+                        unsafe_allow_html=True,
+                    )
+                except Exception:
+                    try:
+                        st.image(b, use_container_width=True)
+                    except Exception as e:
+                        st.error(f"Gagal render gambar #{idx+1}: {e}")
 
         all_col_a, all_col_b = st.columns(2)
         with all_col_a:
@@ -4015,23 +4369,28 @@ Sistem akan mencari semua PN secara otomatis dan menghasilkan file katalog.
             status_txt  = st.empty()
             total       = len(part_numbers)
             results_all = []
+            # Tiap update progress = 1 delta websocket, sementara search per
+            # PN cuma ~ms — update ~100x saja per batch, bukan per PN.
+            update_every = max(1, total // 100)
 
             for i, pn in enumerate(part_numbers):
-                status_txt.text(f"🔍 Mencari {i+1}/{total}: {pn}")
-                prog.progress((i + 1) / total)
-                found = search_part_number(pn, st.session_state.excel_files, self.stok_cache, self.harga_lookup)
+                if i % update_every == 0 or i + 1 == total:
+                    status_txt.text(f"🔍 Mencari {i+1}/{total}: {pn}")
+                    prog.progress((i + 1) / total)
+                found = search_part_number(pn, st.session_state.excel_files, self.stok_cache, self.harga_lookup,
+                                           search_index=st.session_state.get("search_index"))
                 if found:
                     # Gabungkan semua file yang cocok ke 1 baris saja
-                    hasil_list = [r["File"] for r in found]
-                    sheet_list = [r["Sheet"] for r in found]
+                    hasil_list = found["File"]
+                    sheet_list = found["Sheet"]
                     results_all.append({
                         "Part Number": pn,
                         "_pn_group":   pn,
                         "Hasil":       ", ".join(hasil_list),
                         "Sheet":       ", ".join(sheet_list),
-                        "Part Name":   found[0]["Part Name"],
-                        "Qty":         found[0]["Quantity"],
-                        "Stok":        found[0]["Stok"],
+                        "Part Name":   found["Part Name"][0],
+                        "Qty":         found["Quantity"][0],
+                        "Stok":        found["Stok"][0],
                         "Status":      "✅ Ditemukan",
                     })
                 else:
@@ -4303,12 +4662,9 @@ Sistem akan mencari semua PN secara otomatis dan menghasilkan file katalog.
                         },
                     )
 
-                    dl_buf = io.BytesIO()
-                    df_display.to_excel(dl_buf, index=False, engine="openpyxl")
-                    dl_buf.seek(0)
                     st.download_button(
                         label="⬇️ Download Excel",
-                        data=dl_buf.getvalue(),
+                        data=_df_xlsx_download_data(df_display),
                         file_name=f"harga_sparepart_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                         key="harga_download",
@@ -4571,7 +4927,7 @@ Sistem akan mencari semua PN secara otomatis dan menghasilkan file katalog.
                 for cf in CACHE_FOLDER.glob("*.pkl"):
                     try: cf.unlink()
                     except Exception: pass
-                for k in ("excel_files","last_index_time","last_file_count","stok_data",
+                for k in ("excel_files","search_index","last_index_time","last_file_count","stok_data",
                           "stok_gudang_data","stok_gudang_names",
                           "harga_data","harga_lookup"):
                     st.session_state.pop(k, None)
@@ -4616,7 +4972,7 @@ Sistem akan mencari semua PN secara otomatis dan menghasilkan file katalog.
             st.markdown('<div class="mp-sb-section">Akun</div>', unsafe_allow_html=True)
             if st.button("🚪 Logout", type="secondary", use_container_width=True, key="sb_logout"):
                 LoginManager.logout()
-                for k in ("excel_files","index_data","search_results",
+                for k in ("excel_files","search_index","index_data","search_results",
                           "last_index_time","loaded_files_count","last_file_count"):
                     st.session_state.pop(k, None)
                 st.rerun()
@@ -4786,7 +5142,7 @@ Sistem akan mencari semua PN secara otomatis dan menghasilkan file katalog.
             )
 
     def display_search_results(self):
-        results = st.session_state.get("search_results", [])
+        results = st.session_state.get("search_results", {})
         if results:
             user = LoginManager.get_current_user()
             role = user["role"] if user else "user"
@@ -4808,13 +5164,18 @@ Sistem akan mencari semua PN secara otomatis dan menghasilkan file katalog.
                 f'<span style="font-size:15px;font-weight:700;letter-spacing:-.01em;'
                 f'color:var(--mp-ink);">📋 Hasil Pencarian</span>'
                 f'<span class="mp-chip" style="font-family:var(--mp-font-mono);">'
-                f'{len(results)} ditemukan</span>'
+                f'{_result_count(results)} ditemukan</span>'
                 f'<span style="font-size:12px;color:var(--mp-ink-50);">untuk</span>'
                 f'<span class="mp-chip gray" style="font-family:var(--mp-font-mono);">'
                 f'{search_term}</span>'
                 f'</div>',
                 unsafe_allow_html=True,
             )
+            search_limit = st.session_state.get("search_limit")
+            if (st.session_state.get("search_type") == "Part Name"
+                    and search_limit and _result_count(results) >= search_limit):
+                st.caption(f"ℹ️ Dibatasi {search_limit:,} hasil pertama — "
+                           "perjelas kata kunci atau naikkan batas maks. hasil.")
             df_res = pd.DataFrame(results)
             # Catatan: kolom "Stok" SELALU total seluruh gudang (untuk semua
             # akun). Stok per-cabang ditampilkan di section terpisah di bawah.
@@ -5291,12 +5652,9 @@ Sistem akan mencari semua PN secara otomatis dan menghasilkan file katalog.
         else:
             df_show = df_filtered.rename(columns=lambda c: c.strip())
             st.dataframe(df_show, hide_index=True, use_container_width=True, height=500)
-            dl_buf = io.BytesIO()
-            df_show.to_excel(dl_buf, index=False, engine="openpyxl")
-            dl_buf.seek(0)
             st.download_button(
                 label="⬇️ Download Excel",
-                data=dl_buf.getvalue(),
+                data=_df_xlsx_download_data(df_show),
                 file_name=f"populasi_unit_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 key="pop_download",
@@ -35,8 +35,11 @@ import json
 import os
 import re
 import time
+import heapq
 import difflib
+from collections.abc import Set as AbstractSet
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
@@ -733,45 +736,48 @@ BENGKEL_DICT: dict[str, list[str]] = _load_json_mapping(
 )
 
 
-_unit_token_cache: dict[int, set[str]] = {}
-_real_pn_cache: dict[int, set[str]] = {}
-
-
 def _known_unit_tokens(excel_files: list | None) -> set[str]:
     """Kumpulkan semua signature token nama unit/tipe (mis. 'NX371', 'NX280', '6X4')
     dari semua file katalog. Dipakai supaya token semacam ini tidak salah dianggap PN.
-    Di-cache per-list (by id) supaya tidak diulang setiap pesan."""
+    Di-cache per himpunan nama file (bukan id list — list excel_files diganti tiap
+    reload, id bisa dipakai ulang) supaya tidak diulang setiap pesan."""
     if not excel_files:
         return set()
-    key = id(excel_files)
-    cached = _unit_token_cache.get(key)
-    if cached is not None:
-        return cached
+    return _unit_tokens_for_names(
+        frozenset(fi.get("simple_name", "") for fi in excel_files) - {""}
+    )
+
+
+@lru_cache(maxsize=1)
+def _unit_tokens_for_names(simple_names: frozenset[str]) -> set[str]:
     tokens: set[str] = set()
-    for fi in excel_files:
-        sn = fi.get("simple_name", "")
-        if not sn:
-            continue
+    for sn in simple_names:
         u_tokens = re.findall(r"[A-Z0-9]+", sn.upper())
         tokens.update(_unit_signature_tokens(u_tokens))
-    _unit_token_cache[key] = tokens
     return tokens
 
 
-def _known_pn_set(excel_files: list | None) -> set[str]:
+def _session_pn_index() -> dict | None:
+    """Index trigram PN global milik session (`build_search_index(...)["pn"]`),
+    dibangun sekali per load di app.py. None kalau belum ada."""
+    search_index = st.session_state.get("search_index")
+    return search_index.get("pn") if search_index else None
+
+
+def _known_pn_set(excel_files: list | None) -> AbstractSet[str]:
     """Kumpulkan semua PN asli yang benar-benar ada di index katalog (semua file).
     Dipakai sebagai 'penyelamat' supaya PN asli yang kebetulan mirip nama unit
-    (mis. ada PN literal 'NX371') tetap dianggap PN, bukan di-exclude membabi buta."""
+    (mis. ada PN literal 'NX371') tetap dianggap PN, bukan di-exclude membabi buta.
+    Pakai key posting index PN global (dict PN unik) — tanpa kumpulkan ulang dan
+    tanpa cache sendiri; fallback kumpulkan dari excel_files kalau index belum ada."""
     if not excel_files:
         return set()
-    key = id(excel_files)
-    cached = _real_pn_cache.get(key)
-    if cached is not None:
-        return cached
+    pn_index = _session_pn_index()
+    if pn_index is not None:
+        return pn_index["postings"].keys()
     pns: set[str] = set()
     for fi in excel_files:
         pns.update(fi.get("part_number_index", {}).keys())
-    _real_pn_cache[key] = pns
     return pns
 
 
@@ -1013,13 +1019,12 @@ def _fuzzy_similar_pn(
     """Cari PN serupa menggunakan SequenceMatcher (difflib)."""
     if not excel_files:
         return []
-    all_pns: list[str] = []
-    for fi in excel_files:
-        idx_dict = fi.get("part_number_index", {})
-        all_pns.extend(idx_dict.keys())
-
+    # PN unik dari index global (vocab, dibangun sekali per load) — tidak
+    # perlu kumpulkan ulang key semua file tiap panggilan.
+    pn_index = _session_pn_index()
+    all_pns = pn_index["vocab"] if pn_index is not None else list(_known_pn_set(excel_files))
     # batasi ke 50k PN untuk performa
-    all_pns = list(set(all_pns))[:50_000]
+    all_pns = all_pns[:50_000]
     matches = difflib.get_close_matches(pn.upper(), all_pns, n=n, cutoff=cutoff)
     return matches
 
@@ -1110,7 +1115,7 @@ def _build_system_prompt(
     kurs: float = KURS_CNY_IDR_FALLBACK,
 ) -> str:
     intents = intents or [Intent.UNKNOWN]
-    n_parts = sum(len(fi.get("dataframe", [])) for fi in (excel_files or []))
+    n_parts = sum(fi.get("row_count", 0) for fi in (excel_files or []))
     unit_labels = list({
         fi.get("simple_name", "") for fi in (excel_files or [])
         if fi.get("simple_name", "")
@@ -1490,12 +1495,11 @@ def _lookup_pn(
                 if ul and ul not in result["units"]:
                     result["units"].append(ul)
                 if result["name"] is None:
-                    df  = fi.get("dataframe")
-                    idx = pni[pn][0]
-                    if df is not None:
+                    names = fi.get("part_name_arr")
+                    idx   = pni[pn][0]
+                    if names is not None:
                         try:
-                            row = df.iloc[idx]
-                            nm = str(row.get("part_name", "")).strip()
+                            nm = str(names[idx]).strip()
                             if nm and nm.upper() not in ("NAN", "N/A", "NONE", ""):
                                 result["name"] = nm
                         except Exception:
@@ -1542,6 +1546,34 @@ def _format_pn_context(info: dict, kurs: float = KURS_CNY_IDR_FALLBACK) -> str:
     return "\n".join(lines)
 
 
+def _close_words(word: str, possibilities: list[str], scores: dict[str, float],
+                 n: int = 3, cutoff: float = 0.78) -> list[str]:
+    """Sama dengan difflib.get_close_matches(word, possibilities, n, cutoff), tapi
+    skor per kata disimpan di `scores` (dipakai ulang antar file dalam 1 query).
+    Kata index yang sama muncul di ratusan sheet — tanpa memo, difflib menghitung
+    ulang rasio kata yang sama di tiap file (~90% waktu query yang tidak ketemu).
+    """
+    sm = None
+    result = []
+    for x in possibilities:
+        score = scores.get(x)
+        if score is None:
+            if sm is None:
+                sm = difflib.SequenceMatcher()
+                sm.set_seq2(word)
+            sm.set_seq1(x)
+            # ratio() <= quick_ratio() <= real_quick_ratio(): kalau batas atas
+            # sudah di bawah cutoff, rasio aslinya pasti juga (sama seperti difflib).
+            if sm.real_quick_ratio() >= cutoff and sm.quick_ratio() >= cutoff:
+                score = sm.ratio()
+            else:
+                score = 0.0
+            scores[x] = score
+        if score >= cutoff:
+            result.append((score, x))
+    return [x for _, x in heapq.nlargest(n, result)]
+
+
 def _search_parts_by_name(
     query: str,
     excel_files: list | None,
@@ -1580,6 +1612,9 @@ def _search_parts_by_name(
     phrase_kws = [nk for nk in name_kws if " " in nk]  # multi-word → phrase boost
     target_units_set = set(target_units) if target_units else None
 
+    # Skor difflib per keyword → {kata index: rasio}, share antar file & pass.
+    close_scores: dict[str, dict[str, float]] = {}
+
     def _do_search(file_list, filter_unit):
         results = []
         seen_pn: set[str] = set()
@@ -1615,9 +1650,10 @@ def _search_parts_by_name(
                         continue
                 elif unit_kws and not any(uk in simple_name for uk in unit_kws):
                     continue
-            df      = fi.get("dataframe")
-            pni_idx = fi.get("part_name_index", {})
-            if df is None:
+            pn_arr   = fi.get("part_number_arr")
+            name_arr = fi.get("part_name_arr")
+            pni_idx  = fi.get("part_name_index", {})
+            if pn_arr is None or name_arr is None:
                 continue
 
             # idx_hits: index baris -> set keyword yang match (substring ATAU fuzzy/typo).
@@ -1629,7 +1665,9 @@ def _search_parts_by_name(
                     # Toleransi typo: nk mungkin salah ketik dari kata di katalog
                     # (mis. user ketik "BEARNG", katalog punya "BEARING"). Dibatasi
                     # 5000 kata pertama per file supaya tetap cepat di katalog besar.
-                    nk_hit_words = difflib.get_close_matches(nk, index_words[:5000], n=3, cutoff=0.78)
+                    nk_hit_words = _close_words(
+                        nk, index_words[:5000], close_scores.setdefault(nk, {})
+                    )
                 for w in nk_hit_words:
                     for idx in pni_idx[w]:
                         idx_hits.setdefault(idx, set()).add(nk)
@@ -1644,9 +1682,8 @@ def _search_parts_by_name(
                 if name_kws and not matched_kws:
                     continue
                 try:
-                    row   = df.iloc[idx]
-                    pn_v  = str(row["part_number"]).strip().upper()
-                    pname = str(row["part_name"]).strip()
+                    pn_v  = str(pn_arr[idx]).strip().upper()
+                    pname = str(name_arr[idx]).strip()
                     if not pn_v or pn_v in ("NAN", "N/A", "NONE", ""):
                         continue
                     if pn_v in seen_pn:
@@ -2006,7 +2043,7 @@ def render_chat_ai_tab(
     # ── Info bar ─────────────────────────────────────────────────────
     col_info, col_export, col_clear = st.columns([5, 1, 1])
     with col_info:
-        n_parts = sum(len(fi.get("dataframe", [])) for fi in (excel_files or []))
+        n_parts = sum(fi.get("row_count", 0) for fi in (excel_files or []))
         n_stok  = len(stok_cache or {})
         n_harga = len(harga_lookup or {})
         st.caption(
@@ -0,0 +1,445 @@
+"""
+EXCEL INDEXER
+=============
+Parse 1 file katalog Excel → list entry index per sheet (kolom B/D/E =
+Part Number / Part Name / Quantity), plus index trigram global PN/Part Name
+di atas semua entry (`build_search_index` / `trigram_matches`).
+
+Dipisah dari app.py supaya logika parse/index bisa dipakai tanpa
+streamlit: modul ini TIDAK import streamlit. Cache pickle (.cache/*.pkl)
+tetap diurus app.py.
+
+Cara pakai:
+    from excel_indexer import index_excel_file, build_search_index
+    entries = index_excel_file(Path("data/xxx.xlsx"), Path("xxx.xlsx"))
+    index   = build_search_index(entries)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# ── Engine baca Excel ────────────────────────────────────────────────
+# calamine (parser Rust, pandas >= 2.2) ~7x lebih cepat dari openpyxl untuk
+# index katalog dengan hasil identik. Kalau tidak ter-install / pandas lama,
+# pemanggil fallback ke openpyxl.
+try:
+    import python_calamine
+    EXCEL_READ_ENGINE = "calamine"
+except ImportError:
+    python_calamine = None
+    EXCEL_READ_ENGINE = "openpyxl"
+
+# Kolom yang di-index: B/D/E (0-based) → nama kolom entry.
+_INDEX_COLUMNS = ((1, "part_number"), (3, "part_name"), (4, "quantity"))
+
+# String yang oleh pandas (default na_values read_excel) dianggap kosong.
+_NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+})
+
+
+@lru_cache(maxsize=4096)
+def extract_simple_filename(filename):
+    name = os.path.splitext(filename)[0]
+    return name.split(" - ")[-1] if " - " in name else name
+
+
+def _cell_str(value):
+    """
+    Sel mentah calamine/openpyxl → str / NaN, sama dengan
+    read_excel(dtype=str). None = sel error openpyxl (#DIV/0! dst).
+    """
+    if value is None:
+        return np.nan
+    if isinstance(value, str):
+        return np.nan if value in _NA_STRINGS else value
+    if isinstance(value, float):
+        int_value = int(value)
+        return str(int_value) if int_value == value else str(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return str(value)
+
+
+def _read_calamine_sheets(file_path):
+    """
+    Baca kolom B/D/E semua sheet langsung dari python_calamine, tanpa lewat
+    read_excel. read_excel(engine="calamine") mengonversi SEMUA kolom sel
+    per sel lalu menjalankan TextParser di atasnya — ~40% waktu baca katalog.
+    Di sini cuma 3 kolom yang dikonversi, hasilnya identik (header baris 1,
+    baris kosong tetap ada, NA string → NaN, float bulat → int).
+    Sheet < 5 kolom (mis. sheet cover/catatan) dan sheet tanpa isi di-skip
+    — sama dengan hasil fallback per sheet, tapi workbook tidak perlu
+    dibuka ulang pakai openpyxl (~7x lebih lambat).
+    """
+    workbook = python_calamine.CalamineWorkbook.from_path(str(file_path))
+    sheets   = []
+    for sheet_name in workbook.sheet_names:
+        rows = workbook.get_sheet_by_name(sheet_name).to_python(skip_empty_area=False)
+        df   = _index_sheet_frame(rows)
+        if df is not None:
+            sheets.append((sheet_name, df))
+    return sheets
+
+
+def _read_openpyxl_sheets(file_path):
+    """
+    Versi openpyxl dari `_read_calamine_sheets` (kalau python_calamine tidak
+    ter-install): workbook read_only dibaca langsung baris per baris, tanpa
+    read_excel — ~2x lebih cepat karena TextParser pandas di-skip. Baris
+    dikonversi persis seperti reader openpyxl pandas (None → "", sel error
+    → NaN, sel kosong di ujung baris & baris kosong di akhir sheet dibuang).
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheets = []
+        for ws in workbook.worksheets:
+            ws.reset_dimensions()
+            rows, last_row = [], -1
+            for cells in ws.iter_rows():
+                row = [
+                    "" if c.value is None else (None if c.data_type == "e" else c.value)
+                    for c in cells
+                ]
+                while row and row[-1] == "":
+                    row.pop()
+                if row:
+                    last_row = len(rows)
+                rows.append(row)
+            df = _index_sheet_frame(rows[:last_row + 1])
+            if df is not None:
+                sheets.append((ws.title, df))
+        return sheets
+    finally:
+        workbook.close()
+
+
+def _index_sheet_frame(rows):
+    """
+    Baris sel mentah 1 sheet (baris 1 = header) → DataFrame kolom B/D/E,
+    atau None kalau sheet kosong / kurang dari 5 kolom (sheet cover dsb).
+    Baris yang lebih pendek dari sheet dianggap berisi sel kosong.
+    """
+    if max(map(len, rows), default=0) < 5:
+        return None
+    body = rows[1:]
+    return pd.DataFrame(
+        {
+            name: [_cell_str(row[col]) if col < len(row) else np.nan for row in body]
+            for col, name in _INDEX_COLUMNS
+        },
+        dtype=object,
+    )
+
+
+def _read_index_sheets(file_path):
+    """
+    Yield (sheet_name, df) kolom B/D/E (PN, Name, Qty) untuk semua sheet.
+    Fast path: workbook dibuka sekali dan semua sheet di-parse dalam satu
+    call — langsung via python_calamine kalau ada, kalau tidak openpyxl
+    read_only. Kalau gagal (mis. workbook korup sebagian), fallback per
+    sheet via read_excel openpyxl supaya sheet lain tetap ke-index.
+    """
+    try:
+        if python_calamine is not None:
+            sheets = _read_calamine_sheets(file_path)
+        else:
+            sheets = _read_openpyxl_sheets(file_path)
+    except Exception:
+        sheets = None
+    if sheets is not None:
+        yield from sheets
+        return
+
+    xls = pd.ExcelFile(file_path, engine="openpyxl")
+    for sheet_name in xls.sheet_names:
+        try:
+            yield sheet_name, pd.read_excel(xls, sheet_name=sheet_name, usecols=[1, 3, 4], dtype=str)
+        except Exception:
+            continue
+
+
+def _join_column(values):
+    """
+    Gabung list string (sudah upper) jadi satu string dengan separator \x01
+    (tidak mungkin ada di query, jadi match tidak bisa lintas baris) + array
+    offset awal tiap baris.
+    """
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    offsets = np.zeros(len(values), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=offsets[1:])
+    return "\x01".join(values), offsets
+
+
+def _display_column(values, strip=False):
+    """
+    Kolom mentah (str / NaN) → object array string siap tampil: NaN → "N/A",
+    opsional strip. Dinormalisasi sekali di sini supaya hasil search cukup
+    ambil arr[rows], tanpa cek notna + str() per baris per query.
+    """
+    if strip:
+        out = [str(v).strip() if ok else "N/A" for v, ok in zip(values, pd.notna(values))]
+    else:
+        out = [str(v) if ok else "N/A" for v, ok in zip(values, pd.notna(values))]
+    return np.array(out, dtype=object)
+
+
+def index_excel_file(file_path, relative_path):
+    """
+    Parse semua sheet `file_path` → list dict entry index (1 per sheet).
+    Sheet yang gagal di-skip; file yang gagal total → list kosong.
+    """
+    results     = []
+    file_name   = file_path.name
+    simple_name = extract_simple_filename(file_name)
+    try:
+        for sheet_name, df in _read_index_sheets(file_path):
+            try:
+                df.columns = ["part_number","part_name","quantity"]
+
+                # Pre-normalize vectorized — 5–10× lebih cepat dari
+                # iterrows + per-row str() pada 920k baris total.
+                # Dtype string[pyarrow]: buffer UTF-8 kontigu, strip/upper
+                # jalan di kernel Arrow (C++), bukan per-objek str Python.
+                # pyarrow selalu ada (dependency streamlit).
+                pn_series = (
+                    df["part_number"].astype("string[pyarrow]").fillna("")
+                    .str.strip().str.upper()
+                )
+                nm_series = (
+                    df["part_name"].astype("string[pyarrow]").fillna("")
+                    .str.strip().str.upper()
+                )
+
+                # Index dibangun dari list str biasa (1x tolist per kolom,
+                # dipakai juga untuk kolom gabungan). Loop dict.setdefault di
+                # sini ~9x lebih cepat dari groupby(...).apply(list) dan ~4x
+                # dari Series.items(): output memang harus dict of list int,
+                # jadi explode/factorize vectorized tetap berakhir di
+                # .tolist() per key dan malah lebih lambat.
+                pn_list = pn_series.tolist()
+                nm_list = nm_series.tolist()
+
+                # pn_idx: dict[PN_upper, list[row_idx]] — urutan key = urutan
+                # kemunculan pertama, row_idx urut naik.
+                pn_idx = {}
+                pn_add = pn_idx.setdefault
+                for idx, pn in enumerate(pn_list):
+                    if pn:
+                        pn_add(pn, []).append(idx)
+
+                # Kolom PN/Name digabung jadi 1 string + offset per baris —
+                # search cukup str.find (BMH di C), lihat _joined_find_rows.
+                pn_joined, pn_offsets     = _join_column(pn_list)
+                name_joined, name_offsets = _join_column(nm_list)
+
+                # nm_idx: dict[kata (>2 huruf), list[row_idx]].
+                nm_idx = {}
+                nm_add = nm_idx.setdefault
+                for idx, nm in enumerate(nm_list):
+                    if not nm:
+                        continue
+                    for word in nm.split():
+                        if len(word) > 2:
+                            nm_add(word, []).append(idx)
+                # Posting Part Name disimpan int32 array (sudah urut naik):
+                # 4 byte/posting vs ~36 byte list-of-int — index nama seluruh
+                # katalog ~38 MB → ~18 MB RAM. Index PN tetap list karena
+                # mayoritas PN cuma 1 baris (overhead ndarray malah lebih besar).
+                nm_idx = {w: np.asarray(ids, dtype=np.int32) for w, ids in nm_idx.items()}
+                results.append({
+                    "full_path": str(file_path), "file_name": file_name,
+                    "relative_path": str(relative_path), "simple_name": simple_name,
+                    "sheet": sheet_name, "row_count": len(df),
+                    "col_count": len(df.columns), "part_number_index": pn_idx,
+                    "part_name_index": nm_idx,
+                    # Kolom PN/Name yang sudah strip+upper — dipakai search
+                    # supaya tidak upper ulang per query.
+                    "pn_joined": pn_joined, "pn_offsets": pn_offsets,
+                    "name_joined": name_joined, "name_offsets": name_offsets,
+                    # Simpan 3 kolom sebagai array (SoA), bukan DataFrame utuh —
+                    # lookup per hit cukup arr[idx], tanpa overhead .iloc.
+                    # Isinya string siap tampil (sel kosong = "N/A", PN di-strip).
+                    "part_number_arr": _display_column(df["part_number"].to_numpy(dtype=object), strip=True),
+                    "part_name_arr":   _display_column(df["part_name"].to_numpy(dtype=object)),
+                    "quantity_arr":    _display_column(df["quantity"].to_numpy(dtype=object)),
+                    "last_modified": datetime.fromtimestamp(file_path.stat().st_mtime),
+                })
+                del df
+            except Exception:
+                continue
+    except Exception:
+        pass
+    return results
+
+
+# ── Format pickle cache ──────────────────────────────────────────────
+# part_name_index (ribuan int32 array kecil per sheet) paling mahal di-
+# unpickle: ~0.5 s untuk seluruh katalog, karena tiap array direkonstruksi
+# sendiri. Di disk disimpan format CSR (list kata + panjang posting + 1
+# array flat) lalu dipecah jadi view saat load — ~3x lebih cepat. Index PN
+# tetap dict of list (posting mayoritas 1 baris, CSR tidak lebih cepat).
+
+def pack_for_cache(entries):
+    """List entry → versi siap pickle (entry asli tidak diubah)."""
+    packed = []
+    for e in entries:
+        nm_idx = e["part_name_index"]
+        words  = list(nm_idx)
+        lens   = np.fromiter((len(nm_idx[w]) for w in words), dtype=np.int64, count=len(words))
+        flat   = (np.concatenate([nm_idx[w] for w in words]) if words
+                  else np.zeros(0, dtype=np.int32))
+        packed.append({**e, "part_name_index": (words, lens, flat)})
+    return packed
+
+
+def unpack_from_cache(packed):
+    """Kebalikan `pack_for_cache` (in-place, return list yang sama)."""
+    for e in packed:
+        words, lens, flat = e["part_name_index"]
+        e["part_name_index"] = (
+            dict(zip(words, np.split(flat, np.cumsum(lens[:-1])))) if words else {}
+        )
+    return packed
+
+
+def intern_strings(entries):
+    """
+    sys.intern key index PN/Part Name dan isi kolom PN/Name/Qty (in-place,
+    return list yang sama). PN, kata, dan qty yang sama berulang di ratusan
+    sheet; setelah unpickle / parse tiap kemunculan jadi objek str
+    sendiri. Di-intern ~280 MB → ~230 MB untuk seluruh katalog (~0.4 s).
+    Intern tidak ikut terbawa pickle, jadi dipanggil ulang setelah load.
+    """
+    intern = sys.intern
+    for e in entries:
+        e["part_number_index"] = {intern(k): v for k, v in e["part_number_index"].items()}
+        e["part_name_index"]   = {intern(k): v for k, v in e["part_name_index"].items()}
+        for col in ("part_number_arr", "part_name_arr", "quantity_arr"):
+            e[col] = np.array([intern(v) for v in e[col].tolist()], dtype=object)
+    return entries
+
+
+# ── Index global (trigram) ───────────────────────────────────────────
+
+def _trigrams(s):
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _build_trigram_index(postings):
+    """
+    {key: [file_idx, ...]} -> dict index trigram:
+      vocab    : list key unik (upper)
+      postings : {key: int32[file_idx]}     — sheet mana saja yang punya key tsb
+      trigrams : {3-gram: int32[vocab_id]}  — sorted, untuk query substring
+    """
+    vocab    = list(postings)
+    trigrams = {}
+    for kid, key in enumerate(vocab):
+        for g in _trigrams(key):
+            trigrams.setdefault(g, []).append(kid)
+    return {
+        "vocab":    vocab,
+        "postings": {k: np.asarray(v, dtype=np.int32) for k, v in postings.items()},
+        "trigrams": {g: np.asarray(v, dtype=np.int32) for g, v in trigrams.items()},
+    }
+
+
+def build_search_index(excel_files):
+    """
+    Index global (dibangun sekali saat load, di-share via cache_resource):
+      "pn"   : index trigram Part Number (kolom B)
+      "name" : index trigram Part Name (kolom D) — nama unik di katalog cuma
+               belasan ribu, jadi murah walau baris totalnya ratusan ribu
+    Query substring cukup intersect posting trigram lalu verifikasi `in`
+    pada kandidat — tidak perlu scan semua key di semua file.
+    """
+    pn_postings, name_postings = {}, {}
+    for fi_idx, fi in enumerate(excel_files):
+        for pn in fi.get("part_number_index", {}):
+            pn_postings.setdefault(pn, []).append(fi_idx)
+        for nm in set(fi.get("name_joined", "").split("\x01")):
+            if nm:
+                name_postings.setdefault(nm, []).append(fi_idx)
+    return {
+        "pn":   _build_trigram_index(pn_postings),
+        "name": _build_trigram_index(name_postings),
+    }
+
+
+# Index global di-persist ke disk (app.py) dalam format CSR yang sama
+# dengan part_name_index: posting & trigram jadi (panjang, 1 array flat)
+# lalu dipecah jadi view saat load. Unpickle ~0.06 s vs ~1.2 s build ulang
+# (atau ~0.4 s pickle dict-of-array biasa) untuk seluruh katalog.
+
+def _csr_pack(lists):
+    lens = np.fromiter((len(v) for v in lists), dtype=np.int64, count=len(lists))
+    flat = np.concatenate(lists) if lists else np.zeros(0, dtype=np.int32)
+    return lens, flat
+
+
+def _csr_split(lens, flat):
+    return np.split(flat, np.cumsum(lens[:-1])) if len(lens) else []
+
+
+def pack_search_index(index):
+    """Index dari `build_search_index` → versi siap pickle (asli tidak diubah)."""
+    packed = {}
+    for kind, tri in index.items():
+        vocab = tri["vocab"]
+        grams = list(tri["trigrams"])
+        packed[kind] = {
+            "vocab":    vocab,
+            # key postings == vocab (urutan sama), cukup simpan array-nya.
+            "postings": _csr_pack([tri["postings"][k] for k in vocab]),
+            "grams":    grams,
+            "trigrams": _csr_pack([tri["trigrams"][g] for g in grams]),
+        }
+    return packed
+
+
+def unpack_search_index(packed):
+    """Kebalikan `pack_search_index`. Key di-intern seperti `intern_strings`."""
+    index = {}
+    for kind, p in packed.items():
+        vocab = [sys.intern(k) for k in p["vocab"]]
+        index[kind] = {
+            "vocab":    vocab,
+            "postings": dict(zip(vocab, _csr_split(*p["postings"]))),
+            "trigrams": dict(zip(p["grams"], _csr_split(*p["trigrams"]))),
+        }
+    return index
+
+
+def trigram_matches(term_up, tri_index):
+    """
+    Key di `tri_index` yang mengandung term_up (sudah diverifikasi).
+    Return None kalau index tidak bisa dipakai (query < 3 huruf).
+    """
+    if len(term_up) < 3:
+        return None
+    lists = []
+    for g in _trigrams(term_up):
+        ids = tri_index["trigrams"].get(g)
+        if ids is None:
+            return []
+        lists.append(ids)
+    lists.sort(key=len)
+    cand = lists[0]
+    for ids in lists[1:]:
+        cand = np.intersect1d(cand, ids, assume_unique=True)
+        if not len(cand):
+            return []
+    vocab = tri_index["vocab"]
+    return [vocab[kid] for kid in cand if term_up in vocab[kid]]
@@ -1486,8 +1486,7 @@ def _try_get_part_name(pn: str) -> str:
         for fi in excel_files:
             idx_map = fi.get("part_number_index", {})
             if pn_upper in idx_map:
-                row = fi["dataframe"].iloc[idx_map[pn_upper][0]]
-                return str(row.get("part_name", "")).strip()
+                return str(fi["part_name_arr"][idx_map[pn_upper][0]]).strip()
     except Exception:
         pass
     return ""
@@ -1931,6 +1930,7 @@ def render_search_image_tab():
                         st.session_state.get("excel_files", []),
                         st.session_state.get("stok_data"),
                         st.session_state.get("harga_lookup", {}),
+                        search_index=st.session_state.get("search_index"),
                     )
                     st.session_state.search_type = "Part Number"
                     st.session_state.search_term = trigger_pn